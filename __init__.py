@@ -1 +1 @@
-from . import editor, highlight, kanjistudy, substudy
+from . import browser, editor, highlight, kanjistudy, substudy
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Benchmark the tokenization and highlighting hot paths.
+
+Each benchmark runs over a synthetic corpus generated from a fixed seed,
+and reports throughput in lines per second along with per-call latency
+percentiles.  Each benchmark is called once before it is timed, so the
+timings are for the steady state: loading the mecab dictionary, starting
+the workers and compiling the regexes are not counted.  Results can be saved to a JSON file and compared against a
+previous run; the comparison fails if throughput drops by more than the
+threshold.
+"""
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import argparse
+import contextlib
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import highlight
+import reading
+
+KANJI_WORDS = ['日本', '漢字', '時間', '学校', '先生', '電車', '友達', '今日',
+    '明日', '天気', '仕事', '映画', '音楽', '世界', '自分', '気持', '大丈夫',
+    '本当', '一緒', '約束', '勉強', '部屋', '食', '見', '行', '来', '言', '思']
+KANA_WORDS = ['これ', 'それ', 'あの', 'ちょっと', 'やっぱり', 'ありがとう',
+    'すごい', 'どうして', 'いい', 'だめ', 'もう', 'まだ', 'ね', 'よ']
+KATAKANA_WORDS = ['テレビ', 'コーヒー', 'ラーメン', 'パソコン', 'ゲーム',
+    'ヴァイオリン', 'メール', 'ケーキ']
+PARTICLES = ['は', 'が', 'を', 'に', 'で', 'と', 'の', 'も', 'から', 'まで']
+ENDINGS = ['です', 'ました', 'ない', 'たい', 'よう', 'だ', 'か']
+PUNCTUATION = ['。', '、', '！', '？', '…', '「', '」']
+OTHER = ['OK', 'Wi-Fi', '2018', '１２３', '①', '&nbsp;', '<b>', '♪', 'é',
+    '\U0001F600', '　']
+
+def sentence(rng, mixed=False):
+    words = []
+    for i in range(rng.randint(3, 12)):
+        pool = rng.choice([KANJI_WORDS, KANJI_WORDS, KANA_WORDS,
+                           KATAKANA_WORDS, PARTICLES, ENDINGS])
+        if mixed and rng.random() < 0.2:
+            pool = OTHER
+        words.append(rng.choice(pool))
+    words.append(rng.choice(PUNCTUATION))
+    return ''.join(words)
+
+def timestamp(ms):
+    return '%02d:%02d:%02d,%03d' % (
+        ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
+
+def subtitle_corpus(rng, n):
+    ret = []
+    ms = 0
+    for i in range(n):
+        start = ms + rng.randint(0, 5000)
+        ms = start + rng.randint(500, 5000)
+        text = '\n'.join(sentence(rng) for j in range(rng.randint(1, 2)))
+        ret.append('%d\n%s --> %s\n%s' % (
+            i + 1, timestamp(start), timestamp(ms), text))
+    return ret
+
+def card_corpus(rng, n):
+    ret = []
+    for i in range(n):
+        card = ''.join(rng.choice(KANJI_WORDS + KANA_WORDS)
+                       for j in range(rng.randint(1, 3)))
+        if rng.random() < 0.3:
+            card = ' %s[%s]' % (rng.choice(KANJI_WORDS), 'かな') + card
+        if rng.random() < 0.1:
+            card += '<br>' + sentence(rng)
+        ret.append(card)
+    return ret
+
+def mixed_corpus(rng, n):
+    return [sentence(rng, mixed=True) for i in range(n)]
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+def measure(fn, items, lines_per_item=1):
+    # Warm up first; see the docstring.
+    if items:
+        fn(items[0])
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    return {
+        'lines_per_sec': len(items) * lines_per_item / max(elapsed, 1e-9),
+        'p50_ms': 1000 * percentile(latencies, 50),
+        'p90_ms': 1000 * percentile(latencies, 90),
+        'p99_ms': 1000 * percentile(latencies, 99),
+    }
+
+def batches(lines, size):
+    return [lines[i:i+size] for i in range(0, len(lines), size)]
+
+def bench_fixup(corpora):
+    return measure(reading.fixup, corpora['mixed'])
+
+def bench_mecab2(corpora):
+    lines = corpora['subtitles']
+    return measure(reading.mecab2, batches(lines, 100), 100)
+
+def bench_mecab_dict(corpora):
+    lines = corpora['cards'] + corpora['cards'][:len(corpora['cards']) // 4]
+    return measure(reading.mecab_dict, batches(lines, 500), 500)
+
+def bench_add_furigana(corpora):
+    return measure(reading.add_furigana, corpora['cards'][:500])
+
+@contextlib.contextmanager
+def known_database(corpora):
+    # Built in a throwaway user_files directory, with its own parse cache,
+    # so the real ones are left alone.
+    old = highlight.user_files_dir, highlight.parse_cache
+    with tempfile.TemporaryDirectory(prefix='motto-bench-') as root:
+        highlight.user_files_dir = root
+        highlight.parse_cache = None
+        try:
+            db = highlight.KnownDatabase()
+            db.anki.lines = corpora['cards']
+            db.anki.write()
+            db.reload()
+            db.process_subtitles(corpora['subtitles'])
+            yield db
+        finally:
+            if highlight.parse_cache is not None:
+                highlight.parse_cache.close()
+            highlight.user_files_dir, highlight.parse_cache = old
+
+def bench_update_known(corpora):
+    with known_database(corpora) as db:
+        # Just the bookkeeping; marked.add() and remove() would also time
+        # writing the journal.
+        def toggle(line):
+            db.update_marked(line, 1)
+            db.update_marked(line, -1)
+        return measure(toggle, corpora['subtitles'][:500])
+
+def bench_highlight(corpora):
+    with known_database(corpora) as db:
+        fmt = '<font color="red">%s</font>'
+        return measure(lambda line: db.highlight(line, fmt),
+                       corpora['subtitles'])
+
+BENCHMARKS = [
+    ('fixup', bench_fixup),
+    ('mecab2', bench_mecab2),
+    ('mecab_dict', bench_mecab_dict),
+    ('add_furigana', bench_add_furigana),
+    ('update_known', bench_update_known),
+    ('highlight', bench_highlight),
+]
+
+def compare(results, baseline, threshold):
+    ok = True
+    for name, result in sorted(results.items()):
+        if name not in baseline:
+            continue
+        old = baseline[name]['lines_per_sec']
+        new = result['lines_per_sec']
+        change = new / old - 1
+        regressed = change < -threshold
+        print('%-14s %12.0f -> %12.0f lines/s %+7.1f%%%s' % (
+            name, old, new, 100 * change, '  REGRESSION' if regressed else ''))
+        ok = ok and not regressed
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=2018)
+    parser.add_argument('--size', type=int, default=2000,
+        help='number of lines in each synthetic corpus')
+    parser.add_argument('--only', action='append',
+        choices=[name for name, fn in BENCHMARKS],
+        help='run only this benchmark (may be repeated)')
+    parser.add_argument('--save', metavar='PATH',
+        help='write the results to a JSON file')
+    parser.add_argument('--compare', metavar='PATH',
+        help='compare against results saved by an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+        help='fractional drop in throughput counted as a regression')
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    corpora = {
+        'subtitles': subtitle_corpus(rng, args.size),
+        'cards': card_corpus(rng, args.size),
+        'mixed': mixed_corpus(rng, args.size),
+    }
+    results = {}
+    for name, fn in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        results[name] = result = fn(corpora)
+        print('%-14s %12.0f lines/s  p50 %8.3f ms  p90 %8.3f ms  p99 %8.3f ms'
+              % (name, result['lines_per_sec'], result['p50_ms'],
+                 result['p90_ms'], result['p99_ms']))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'seed': args.seed,
+                'size': args.size,
+                'python': platform.python_version(),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from anki.hooks import addHook
+from anki.utils import ids2str, splitFields
+from aqt import mw
+from aqt.qt import *
+from aqt.utils import chooseList, tooltip
+from .cards import apply_config
+from .charclass import CJK, table
+from .reading import add_furigana_batch, fixup
+
+def onSetupMenus(browser):
+    a = QAction('Bulk Add Furigana...', browser)
+    a.triggered.connect(lambda: onBulkFurigana(browser))
+    browser.form.menuEdit.addSeparator()
+    browser.form.menuEdit.addAction(a)
+
+def onBulkFurigana(browser):
+    nids = browser.selectedNotes()
+    if not nids:
+        tooltip('No notes selected.')
+        return
+    names = []
+    for mid in mw.col.db.list(
+            'select distinct mid from notes where id in %s' % ids2str(nids)):
+        for f in mw.col.models.get(mid)['flds']:
+            if f['name'] not in names:
+                names.append(f['name'])
+    i = chooseList('Add furigana to which field?', names, parent=browser)
+    apply_config()
+    browser.mw.checkpoint('Bulk Add Furigana')
+    browser.model.beginReset()
+    mw.progress.start(max=len(nids), immediate=True)
+    try:
+        changed = bulk_add_furigana(nids, names[i])
+    finally:
+        mw.progress.finish()
+        browser.model.endReset()
+        mw.requireReset()
+    tooltip('Added furigana to %d notes.' % changed)
+
+def bulk_add_furigana(nids, name, batch_size=500):
+    # The fields are read with one query per batch and parsed together.
+    # Only fields with kanji that don't already have furigana are parsed:
+    # fixup() masks the readings that add_furigana would leave alone.  Only
+    # notes whose field changes are loaded and saved.
+    kanji = table().pattern(CJK)
+    ords = {}
+    changed = 0
+    for start in range(0, len(nids), batch_size):
+        batch = nids[start:start+batch_size]
+        todo = []
+        for nid, mid, flds in mw.col.db.all(
+                'select id, mid, flds from notes where id in %s'
+                % ids2str(batch)):
+            if mid not in ords:
+                fmap = mw.col.models.fieldMap(mw.col.models.get(mid))
+                ords[mid] = fmap[name][0] if name in fmap else None
+            if ords[mid] is None:
+                continue
+            text = splitFields(flds)[ords[mid]]
+            if kanji.search(fixup(text)[0]):
+                todo.append((nid, text))
+        results = add_furigana_batch([text for nid, text in todo])
+        for (nid, text), new in zip(todo, results):
+            if new == text:
+                continue
+            note = mw.col.getNote(nid)
+            note[name] = new
+            note.flush()
+            changed += 1
+        mw.progress.update(value=start + len(batch))
+    return changed
+
+addHook('browser.setupMenus', onSetupMenus)
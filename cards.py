@@ -0,0 +1,138 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from anki.utils import ids2str, splitFields
+from aqt import mw
+from .charclass import is_cjk
+from .highlight import cleanup_card, user_file
+from .reading import set_mecab_workers, use_mecab_library
+import json
+import os
+
+def apply_config():
+    # Read config.json each time, so changes take effect without a
+    # restart.  It is stored under the add-on's folder name.
+    config = mw.addonManager.getConfig(__name__.split('.')[0]) or {}
+    if config.get('mecab_library', False):
+        use_mecab_library()
+    set_mecab_workers(config.get('mecab_workers', 1))
+
+def japanese_models():
+    return [m['id'] for m in mw.col.models.all()
+            if 'japanese' in m['name'].lower()]
+
+# Incremental sync of anki.txt
+##########################################################################
+
+# anki.state.json remembers, for each card with a Japanese note type, the
+# modification time of its note, whether it is suspended and its cleaned
+# up first field.  Only notes whose modification time changed have their
+# fields read again.  Alongside it is kept a count, for each kanji, of the
+# unsuspended and suspended cards it appears on.
+
+def load_state():
+    path = user_file('anki.state.json')
+    if not os.path.exists(path):
+        return {}, {}
+    with open(path) as f:
+        data = json.load(f)
+    if 'cards' not in data:
+        # Written before the kanji were counted.
+        data = {'cards': data}
+    state = dict((int(cid), tuple(entry))
+                 for cid, entry in data['cards'].items())
+    if 'kanji' in data:
+        coverage = data['kanji']
+    else:
+        coverage = {}
+        update_coverage(coverage, [(cid, None, new)
+                                   for cid, new in state.items()])
+    return state, coverage
+
+def save_state(state, coverage):
+    path = user_file('anki.state.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'cards': state, 'kanji': coverage}, f)
+    os.rename(path + '.tmp', path)
+
+def update_coverage(coverage, changes):
+    # coverage[ch] is [unsuspended cards, suspended cards] containing ch.
+    for cid, old, new in changes:
+        for entry, delta in [(old, -1), (new, 1)]:
+            if entry is None:
+                continue
+            mod, suspended, field = entry
+            for ch in set(field):
+                if not is_cjk(ch):
+                    continue
+                counts = coverage.setdefault(ch, [0, 0])
+                counts[suspended] += delta
+                if counts == [0, 0]:
+                    del coverage[ch]
+
+def collection_changes(state):
+    # Returns the new state and a list of (cid, old entry, new entry) for
+    # every card that was added, edited, (un)suspended or deleted.
+    mids = japanese_models()
+    rows = []
+    if mids:
+        rows = mw.col.db.all('''
+select c.id, n.mod, c.queue = -1 from cards c, notes n
+where c.nid = n.id and n.mid in %s''' % ids2str(mids))
+    new_state = {}
+    stale = []
+    for cid, mod, suspended in rows:
+        old = state.get(cid)
+        if old is None or old[0] != mod:
+            stale.append(cid)
+        else:
+            new_state[cid] = (mod, bool(suspended), old[2])
+    if stale:
+        for cid, mod, suspended, flds in mw.col.db.all('''
+select c.id, n.mod, c.queue = -1, n.flds from cards c, notes n
+where c.nid = n.id and c.id in %s''' % ids2str(stale)):
+            field = cleanup_card(splitFields(flds)[0])
+            new_state[cid] = (mod, bool(suspended), field)
+    changes = []
+    for cid in set(state) | set(new_state):
+        old, new = state.get(cid), new_state.get(cid)
+        if old != new:
+            changes.append((cid, old, new))
+    return new_state, changes
+
+def update_state():
+    # Bring anki.state.json up to date with the collection.  Returns the
+    # new state, the kanji coverage and the list of changes.
+    state, coverage = load_state()
+    state, changes = collection_changes(state)
+    if changes:
+        update_coverage(coverage, changes)
+        save_state(state, coverage)
+    return state, coverage, changes
+
+def apply_known_cards(db, state, cancelled=None):
+    # Bring db.anki up to date with the state from update_state(), adding
+    # and removing only the lines that changed.  This doesn't touch the
+    # collection, so it can run off the main thread.  New lines are parsed
+    # in batches first, rather than one at a time as they are added.
+    known = [field for cid, (mod, suspended, field) in sorted(state.items())
+             if not suspended]
+    wanted = set(known)
+    removed = []
+    for line, count in db.anki.index.items():
+        if line not in wanted:
+            removed += [line] * count
+    added = [line for line in dict.fromkeys(known) if line not in db.anki]
+    db.parse_missing(added, cancelled)
+    db.anki.update(added, removed)
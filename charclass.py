@@ -0,0 +1,80 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import bisect
+import re
+import sys
+import unicodedata
+
+# Script classes, as bit flags.  A character's class is decided by its
+# Unicode name, but the names are only looked at once, to build a table
+# of codepoint ranges.
+KATAKANA = 1
+HIRAGANA = 2
+CJK = 4
+JAPANESE = KATAKANA | HIRAGANA | CJK
+
+def classify_name(name):
+    ret = 0
+    if 'KATAKANA' in name:
+        ret |= KATAKANA
+    if 'HIRAGANA' in name:
+        ret |= HIRAGANA
+    if 'CJK' in name:
+        ret |= CJK
+    return ret
+
+class CharTable():
+    def __init__(self):
+        # starts[i] is the first codepoint of a run with class classes[i].
+        self.starts = []
+        self.classes = []
+        prev = None
+        for n in range(sys.maxunicode + 1):
+            cls = classify_name(unicodedata.name(chr(n), ''))
+            if cls != prev:
+                self.starts.append(n)
+                self.classes.append(cls)
+                prev = cls
+        self.patterns = {}
+    def char_class(self, ch):
+        return self.classes[bisect.bisect_right(self.starts, ord(ch)) - 1]
+    def pattern(self, mask):
+        # A regex matching any character whose class intersects mask.
+        if mask not in self.patterns:
+            ranges = []
+            ends = self.starts[1:] + [sys.maxunicode + 1]
+            for start, end, cls in zip(self.starts, ends, self.classes):
+                if cls & mask:
+                    ranges.append('%s-%s' % (
+                        re.escape(chr(start)), re.escape(chr(end - 1))))
+            self.patterns[mask] = re.compile('[%s]' % ''.join(ranges))
+        return self.patterns[mask]
+
+_table = None
+
+def table():
+    global _table
+    if _table is None:
+        _table = CharTable()
+    return _table
+
+def char_class(ch):
+    return table().char_class(ch)
+
+def has_japanese_text(s):
+    return table().pattern(JAPANESE).search(s) is not None
+
+def is_cjk(ch):
+    return bool(table().char_class(ch) & CJK)
@@ -18,7 +18,10 @@ from aqt.qt import *
 from .highlight import *
 from .reading import add_furigana
 
+queue = None
+
 def onContextMenu(ewv, m):
+    global queue
     def onAddFurigana():
         note = ewv.editor.note
         text = note.fields[ewv.editor.currentField]
@@ -26,18 +29,14 @@ def onContextMenu(ewv, m):
         note.fields[ewv.editor.currentField] = text
         mw.progress.timer(100, ewv.editor.loadNoteKeepingFocus, False)
     def onTakeFromQueue():
-        text = queue.lines[i]
-        ewv.editor.doPaste(text, internal=False)
-        j = queue.lines.index('***') if '***' in queue.lines else 0
-        if '***' in queue.lines:
-            queue.lines.remove('***')
-        queue.lines.insert(j+1, '***')
-        queue.write()
+        ewv.editor.doPaste(queue.take(), internal=False)
     a = m.addAction(_("Add Furigana"))
     a.triggered.connect(onAddFurigana)
-    queue = TextCollection('queue.txt', None)
-    i = queue.lines.index('***') + 1 if '***' in queue.lines else 0
-    remaining = len(queue.lines) - i
+    if queue is None:
+        queue = ReviewQueue(None)
+    else:
+        queue.refresh()
+    remaining = queue.remaining()
     note = ewv.editor.note
     currentField = ewv.editor.currentField
     if currentField is not None:
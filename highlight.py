@@ -16,14 +16,50 @@ Highlight presumed unknown words in Japanese text.
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
-if __name__ == '__main__': # HACK
-    from reading import mecab_dict
+if not __package__: # HACK
+    from reading import mecab_dict, ParseCache, set_mecab_workers, \
+        use_mecab_library, stats
+    from subtitles import file_format, ass_cues, srt_cues, text_cues
+    from tokenstore import TokenStore, Vocabulary
 else:
-    from .reading import mecab_dict
+    from .reading import mecab_dict, ParseCache, set_mecab_workers, \
+        use_mecab_library, stats
+    from .subtitles import file_format, ass_cues, srt_cues, text_cues
+    from .tokenstore import TokenStore, Vocabulary
 import argparse
+import collections
+import csv
+import json
 import os
 import subprocess
-import unicodedata
+import sys
+import time
+
+user_files_dir = os.path.join(os.path.dirname(__file__), 'user_files')
+
+def user_file(name):
+    root = user_files_dir
+    if not os.path.isdir(root):
+        os.mkdir(root)
+    return os.path.join(root, name)
+
+parse_cache = None
+
+def get_parse_cache():
+    # Opened on first use, so importing this doesn't create user_files, and
+    # the cache follows user_files_dir if that is changed first.
+    global parse_cache
+    if parse_cache is None:
+        parse_cache = ParseCache(user_file('parse_cache.sqlite'))
+    return parse_cache
+
+def file_stamp(path):
+    # Changes whenever the file is written, or created or removed.
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
 
 def cleanup_card(s):
     s = s.replace('<br>', '')
@@ -32,134 +68,569 @@ def cleanup_card(s):
         s = s[:s.index('[')] + s[s.index(']')+1:]
     return s
 
-def has_japanese_text(s):
-    for ch in s:
-        name = unicodedata.name(ch, 'nope')
-        if 'KATAKANA' in name:
-            return True
-        if 'HIRAGANA' in name:
-            return True
-        if 'CJK' in name:
-            return True
-    return False
-
 class TextCollection():
     def __init__(self, name, update_callback,
-                 split_on='\n\n', postprocess=None):
+                 split_on='\n\n', postprocess=None, journaled=False):
         self.update_callback = update_callback
         self.split_on = split_on
         self.postprocess = postprocess
-        root = os.path.join(os.path.dirname(__file__), 'user_files')
-        if not os.path.isdir(root):
-            os.mkdir(root)
-        self.path = os.path.join(root, name)
+        self.journaled = journaled
+        self.journal_limit = 1000
+        self.path = user_file(name)
+        self.journal_path = self.path + '.journal'
         self.read()
+    @property
+    def lines(self):
+        return self._lines
+    @lines.setter
+    def lines(self, lines):
+        self._lines = lines
+        self.index = collections.Counter(lines)
+    def __contains__(self, line):
+        return line in self.index
     def read(self):
+        self.journal_entries = 0
         if not os.path.exists(self.path):
             self.lines = []
+        else:
+            with open(self.path) as f:
+                lines = f.read().strip().split(self.split_on)
+                lines = [line.rstrip() for line in lines]
+                if self.postprocess is not None:
+                    lines = [self.postprocess(line) for line in lines]
+                self.lines = lines
+        if os.path.exists(self.journal_path):
+            self.replay()
+        self.stamps = self.file_stamps()
+    def file_stamps(self):
+        return [file_stamp(self.path), file_stamp(self.journal_path)]
+    def refresh(self):
+        # Read the files again if they were changed through another copy,
+        # calling back for each line that was added or removed.
+        if self.file_stamps() == self.stamps:
             return
-        with open(self.path) as f:
-            self.lines = f.read().strip().split(self.split_on)
-            self.lines = [line.rstrip() for line in self.lines]
-            if self.postprocess is not None:
-                self.lines = [self.postprocess(line) for line in self.lines]
+        old = self.index
+        self.read()
+        if self.update_callback is None:
+            return
+        for line, count in (old - self.index).items():
+            for i in range(count):
+                self.update_callback(line, -1)
+        for line, count in (self.index - old).items():
+            for i in range(count):
+                self.update_callback(line, 1)
+    def replay(self):
+        # Each entry is "+ line" or "- line", with the line JSON-encoded.
+        # A torn entry at the end (from a crash mid-append) is ignored.
+        with open(self.journal_path) as f:
+            for entry in f:
+                if not entry.endswith('\n'):
+                    break
+                try:
+                    op, line = entry[0], json.loads(entry[2:])
+                except ValueError:
+                    break
+                if op == '+' and line not in self.index:
+                    self._lines.append(line)
+                    self.index[line] += 1
+                elif op == '-' and line in self.index:
+                    self._remove(line)
+                self.journal_entries += 1
     def write(self):
+        t = stats.start()
         with open(self.path + '.tmp', 'w') as f:
             data = self.split_on.join(self.lines) + '\n'
             f.write(data)
         os.rename(self.path + '.tmp', self.path)
-    def add(self, line):
-        if line in self.lines:
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.journal_entries = 0
+        self.stamps = self.file_stamps()
+        stats.stop('collection_write', t, len(data))
+    def log(self, ops):
+        if not self.journaled:
+            self.write()
             return
-        self.lines.append(line)
+        t = stats.start()
+        entries = ''.join('%s %s\n' % (op, json.dumps(line))
+                          for op, line in ops)
+        # If another copy wrote to the files since we read them, keep the
+        # old stamps so that compact() knows to read them again.
+        stale = self.file_stamps() != self.stamps
+        with open(self.journal_path, 'a') as f:
+            f.write(entries)
+        self.journal_entries += len(ops)
+        if not stale:
+            self.stamps = self.file_stamps()
+        stats.stop('journal_append', t, len(entries))
+        if self.journal_entries >= self.journal_limit:
+            self.compact()
+    def compact(self):
+        # Fold the journal into the file, first picking up anything other
+        # copies appended to it, so that their changes aren't lost.
+        self.refresh()
         self.write()
-        self.update_callback()
+    def close(self):
+        if self.journal_entries > 0:
+            self.compact()
+    def _remove(self, line):
+        self._lines.remove(line)
+        self.index[line] -= 1
+        if self.index[line] <= 0:
+            del self.index[line]
+    def add(self, line):
+        if line in self.index:
+            return
+        self._lines.append(line)
+        self.index[line] += 1
+        self.log([('+', line)])
+        self.update_callback(line, 1)
     def remove(self, line):
-        if line not in self.lines:
+        if line not in self.index:
             return
-        self.lines.remove(line)
-        self.write()
-        self.update_callback()
+        self._remove(line)
+        self.log([('-', line)])
+        self.update_callback(line, -1)
+    def update(self, added, removed):
+        # Like calling remove() and add() for each line, with one write.
+        ops = []
+        for line in removed:
+            if line in self.index:
+                self._remove(line)
+                ops.append(('-', line))
+        for line in added:
+            if line not in self.index:
+                self._lines.append(line)
+                self.index[line] += 1
+                ops.append(('+', line))
+        if not ops:
+            return
+        self.log(ops)
+        for op, line in ops:
+            self.update_callback(line, 1 if op == '+' else -1)
+
+class ReviewQueue(TextCollection):
+    # The lines waiting to be made into cards.  queue.cursor holds how many
+    # of them have been taken already, in place of the '***' line that used
+    # to mark the spot.  Long-lived copies call refresh() to pick up changes
+    # made through other copies.
+    def __init__(self, update_callback):
+        self.cursor_path = user_file('queue.cursor')
+        TextCollection.__init__(self, 'queue.txt', update_callback,
+                                journaled=True)
+    def file_stamps(self):
+        return TextCollection.file_stamps(self) + [file_stamp(self.cursor_path)]
+    def read(self):
+        self.cursor = 0
+        TextCollection.read(self)
+        self.read_cursor()
+        if '***' in self.index:
+            self.cursor = self._lines.index('***')
+            self._remove('***')
+            self.log([('-', '***')])
+            self.write_cursor()
+        self.stamps = self.file_stamps()
+    def read_cursor(self):
+        self.cursor = 0
+        if os.path.exists(self.cursor_path):
+            with open(self.cursor_path) as f:
+                self.cursor = int(f.read().strip() or 0)
+        self.cursor = min(self.cursor, len(self._lines))
+    def write_cursor(self):
+        with open(self.cursor_path + '.tmp', 'w') as f:
+            f.write('%d\n' % self.cursor)
+        os.rename(self.cursor_path + '.tmp', self.cursor_path)
+        self.stamps = self.file_stamps()
+    def refresh(self):
+        stamps = self.file_stamps()
+        if stamps[:2] != self.stamps[:2]:
+            TextCollection.refresh(self)
+        elif stamps != self.stamps:
+            self.read_cursor()
+            self.stamps = stamps
+    def _remove(self, line):
+        if self._lines.index(line) < self.cursor:
+            self.cursor -= 1
+        TextCollection._remove(self, line)
+    # Another copy may have moved the cursor since, so it is read again
+    # before being adjusted for the removed lines.
+    def remove(self, line):
+        self.read_cursor()
+        cursor = self.cursor
+        TextCollection.remove(self, line)
+        if self.cursor != cursor:
+            self.write_cursor()
+    def update(self, added, removed):
+        self.read_cursor()
+        cursor = self.cursor
+        TextCollection.update(self, added, removed)
+        if self.cursor != cursor:
+            self.write_cursor()
+    def remaining(self):
+        return len(self._lines) - self.cursor
+    def take(self):
+        line = self._lines[self.cursor]
+        self.cursor += 1
+        self.write_cursor()
+        return line
+
+class Cancelled(Exception):
+    pass
 
 class KnownDatabase():
-    def __init__(self):
+    # Parsed lines are kept in a TokenStore, and the known words are
+    # counted by base form id.  Building one can take a while the first
+    # time; cancelled, if given, is checked between batches and raises
+    # Cancelled once it returns true.
+    def __init__(self, cancelled=None):
         self.subs = []
-        self.reload()
-    def reload(self):
-        self.anki = TextCollection('anki.txt', self.update_known,
-            split_on='\n', postprocess=cleanup_card)
-        self.marked = TextCollection('marked.txt', self.update_known)
-        self.queue = TextCollection('queue.txt', self.update_known)
-        self.process_subtitles(self.subs)
-    def process_subtitles(self, subs):
+        self.vocab = Vocabulary()
+        self.reload(cancelled)
+    def reload(self, cancelled=None):
+        self.anki = TextCollection('anki.txt', self.update_cards,
+            split_on='\n', postprocess=cleanup_card, journaled=True)
+        self.marked = TextCollection('marked.txt', self.update_marked,
+            journaled=True)
+        self.queue = ReviewQueue(self.update_cards)
+        self.process_subtitles(self.subs, cancelled)
+    def process_subtitles(self, subs, cancelled=None):
+        t = stats.start()
         self.subs = subs
         lines = list(self.subs)
         lines += self.anki.lines
         lines += self.marked.lines
         lines += self.queue.lines
-        self.jd = mecab_dict(lines)
-        self.update_known()
-    def update_known(self):
-        self.known = set()
+        self.jd = TokenStore(self.vocab)
+        self.parse_missing(lines, cancelled)
+        stats.stop('parse', t)
+        self.rebuild_known()
+    def parse_missing(self, lines, cancelled=None, batch_size=1024):
+        lines = [line for line in dict.fromkeys(lines) if line not in self.jd]
+        for i in range(0, len(lines), batch_size):
+            if cancelled is not None and cancelled():
+                raise Cancelled()
+            self.jd.update(mecab_dict(lines[i:i+batch_size],
+                                      cache=get_parse_cache()))
+    def parse(self, lines):
+        # Lines parsed while streaming or scoring get their own vocabulary,
+        # so that they don't grow ours; see known_ids().
+        jd = TokenStore(Vocabulary())
+        jd.update(mecab_dict(lines))
+        return jd
+    def known_ids(self, jd):
+        # The known base forms, as ids in jd's vocabulary.  Strings we
+        # have never seen are looked up without being added, and so are
+        # not known.
+        if jd.vocab is self.vocab:
+            return self.known
+        ids = self.vocab.ids
+        known = self.known
+        return set(i for i, s in enumerate(jd.vocab.strings)
+                   if ids.get(s) in known)
+    def add_subtitles(self, subs):
+        # Parse more text without rebuilding the known words, so a file can
+        # be loaded a batch at a time.
+        t = stats.start()
+        self.subs = self.subs + list(subs)
+        self.jd.update(mecab_dict(subs, cache=get_parse_cache()))
+        stats.stop('parse', t)
+    def known_bases(self, line):
+        if line not in self.jd:
+            self.jd.update(mecab_dict([line], cache=get_parse_cache()))
+        return self.jd.japanese_bases(line)
+    def rebuild_known(self):
+        # For each base form, count the lines it appears in.
+        t = stats.start()
+        self.card_known = collections.Counter()
         for line in self.anki.lines + self.queue.lines:
-            for seg, base, reading in self.jd[line]:
-                if not has_japanese_text(base):
-                    continue
-                self.known.add(base)
-        trimmed = TextCollection('marked.trimmed.txt', None)
-        trimmed.lines = []
+            self.card_known.update(self.known_bases(line))
+        self.known = collections.Counter(self.card_known)
         for line in self.marked.lines:
-            segments = self.jd[line]
-            added = False
-            for seg, base, reading in segments:
-                if not has_japanese_text(base):
-                    continue
-                if base not in self.known:
-                    self.known.add(base)
-                    added = True
-            if added:
-                trimmed.lines.append(line)
+            self.known.update(self.known_bases(line))
+        self.changed = set()
+        self.trimmed_dirty = True
+        stats.stop('rebuild_known', t)
+    def update_known(self, counter, line, delta):
+        t = stats.start()
+        for base in self.known_bases(line):
+            before = base in counter
+            counter[base] += delta
+            if counter[base] <= 0:
+                del counter[base]
+            # Remember which base forms became known or unknown, so only
+            # the text containing them needs highlighting again.
+            if counter is self.known and (base in counter) != before:
+                self.changed.add(base)
+        stats.stop('update_known', t)
+    def update_cards(self, line, delta):
+        self.update_known(self.card_known, line, delta)
+        self.update_known(self.known, line, delta)
+        self.trimmed_dirty = True
+    def update_marked(self, line, delta):
+        self.update_known(self.known, line, delta)
+        self.trimmed_dirty = True
+    def pop_changed(self):
+        changed, self.changed = self.changed, set()
+        return changed
+    def trimmed_marked(self):
+        # Marked lines that contain something not already known.
+        known = set(self.card_known)
+        ret = []
+        for line in self.marked.lines:
+            bases = self.known_bases(line)
+            if not bases <= known:
+                ret.append(line)
+                known |= bases
+        return ret
+    def write_trimmed(self):
+        trimmed = TextCollection('marked.trimmed.txt', None)
+        trimmed.lines = self.trimmed_marked()
         trimmed.write()
-    def highlight(self, text, fmt, stats=False):
-        markup = u''
-        r, t = 0, 0
-        for seg, base, reading in self.jd[text]:
-            if has_japanese_text(seg) and base not in self.known:
-                markup += fmt % seg
-                r += len(seg)
+        self.trimmed_dirty = False
+    def close(self):
+        if self.trimmed_dirty:
+            self.write_trimmed()
+        self.anki.close()
+        self.marked.close()
+        self.queue.close()
+    def highlight(self, text, fmt, jd=None, known=None):
+        # Pass known=self.known_ids(jd) when highlighting many lines from
+        # the same jd, since working it out means a pass over jd's
+        # vocabulary.
+        if jd is None:
+            jd = self.jd
+        if known is None:
+            known = self.known_ids(jd)
+        strings = jd.vocab.strings
+        japanese = jd.vocab.japanese
+        markup = []
+        ids = jd.ids(text)
+        for i in range(0, len(ids), 3):
+            seg = strings[ids[i]]
+            if japanese[ids[i]] and ids[i+1] not in known:
+                markup.append(fmt % seg)
             else:
-                markup += seg
-            t += len(seg)
-        if stats:
-            return r, t
-        return markup
+                markup.append(seg)
+        return ''.join(markup)
+    def score(self, blocks, jd, known=None):
+        red, total = 0, 0
+        tokens, unknown = 0, 0
+        unknown_bases = set()
+        strings = jd.vocab.strings
+        japanese = jd.vocab.japanese
+        if known is None:
+            known = self.known_ids(jd)
+        for block in blocks:
+            ids = jd.ids(block)
+            for i in range(0, len(ids), 3):
+                seg = strings[ids[i]]
+                if japanese[ids[i]]:
+                    tokens += 1
+                    if ids[i+1] not in known:
+                        red += len(seg)
+                        unknown += 1
+                        unknown_bases.add(ids[i+1])
+                total += len(seg)
+        return {
+            'comprehension': 100 - (100.0 * red / max(total, 1)),
+            'tokens': tokens,
+            'unknown_tokens': unknown,
+            'unknown_words': len(unknown_bases),
+        }
     def num_in_queue(self):
-        i = self.queue.lines.index('***') + 1 \
-            if '***' in self.queue.lines else 0
-        return len(self.queue.lines) - i
+        self.queue.read_cursor()
+        return self.queue.remaining()
+
+def iter_cues(fmt, f, split_on='\n\n'):
+    if fmt == 'ass':
+        return ass_cues(f)
+    blocks = iter_blocks(f, split_on)
+    if fmt == 'srt':
+        return srt_cues(blocks)
+    return text_cues(blocks)
+
+def read_cues(path):
+    with open(path) as f:
+        return list(iter_cues(file_format(path), f))
+
+def iter_blocks(f, split_on='\n\n', size=65536):
+    # The same blocks as f.read().strip().split(split_on), read lazily.
+    # Whitespace-only blocks are held back until we know they aren't at
+    # the end of the file, along with the last real block.
+    buf = ''
+    held = []
+    started = False
+    def push(part):
+        if part.strip():
+            for block in held:
+                yield block
+            del held[:]
+        held.append(part)
+    while True:
+        data = f.read(size)
+        if not data:
+            break
+        buf += data
+        if not started:
+            buf = buf.lstrip()
+            started = buf != ''
+        parts = buf.split(split_on)
+        buf = parts.pop()
+        for part in parts:
+            for block in push(part):
+                yield block
+    for block in push(buf):
+        yield block
+    yield held[0].rstrip()
+
+def highlight_stream(db, cues, fmt, batch_size=1024):
+    # Parse and highlight a few cues at a time, starting small so the
+    # first output appears quickly.  Only the text of each cue is parsed.
+    def flush(batch):
+        jd = db.parse([cue.text for cue in batch])
+        known = db.known_ids(jd)
+        for cue in batch:
+            if cue.text in jd:
+                yield cue.header + db.highlight(cue.text, fmt, jd, known)
+            else:
+                yield cue.block
+    batch = []
+    size = 16
+    for cue in cues:
+        batch.append(cue)
+        if len(batch) >= size:
+            for markup in flush(batch):
+                yield markup
+            batch = []
+            size = min(2 * size, batch_size)
+    for markup in flush(batch):
+        yield markup
+
+def score_corpus(db, paths, group_size=32):
+    # Files are parsed a group at a time, so that the mecab pool has plenty
+    # to work on without holding the whole corpus in memory.
+    ret = []
+    for i in range(0, len(paths), group_size):
+        group = [(path, [cue.text for cue in read_cues(path) if cue.text])
+                 for path in paths[i:i+group_size]]
+        jd = db.parse([text for path, texts in group for text in texts])
+        known = db.known_ids(jd)
+        for path, texts in group:
+            result = {'path': path}
+            result.update(db.score(texts, jd, known))
+            ret.append(result)
+    return ret
+
+def watch(db, path, fmt, interval=0.5):
+    # Highlight path, then keep watching it and the known word lists.  When
+    # they change, only new blocks are parsed, and only blocks whose
+    # highlighting changed are printed again.
+    lists = [db.anki, db.marked, db.queue]
+    stamp = None
+    cues = []
+    rows = collections.defaultdict(set)
+    shown = {}
+    while True:
+        todo = set()
+        # Editors may briefly remove the file while saving it.
+        new_stamp = file_stamp(path)
+        if new_stamp is not None and new_stamp != stamp:
+            stamp = new_stamp
+            cues = read_cues(path)
+            db.add_subtitles([cue.text for cue in cues
+                              if cue.text and cue.text not in db.jd])
+            # For each base form, the blocks it appears in.
+            rows = collections.defaultdict(set)
+            for row, cue in enumerate(cues):
+                if cue.text in db.jd:
+                    for base in db.jd.bases(cue.text):
+                        rows[base].add(row)
+            todo = set(range(len(cues)))
+            shown = dict((row, markup) for row, markup in shown.items()
+                         if row < len(cues))
+        for lst in lists:
+            lst.refresh()
+        for base in db.pop_changed():
+            todo |= rows.get(base, set())
+        out = []
+        for row in sorted(todo):
+            cue = cues[row]
+            markup = cue.block
+            if cue.text in db.jd:
+                markup = cue.header + db.highlight(cue.text, fmt)
+            if shown.get(row) != markup:
+                shown[row] = markup
+                out.append(markup)
+        if out:
+            if len(out) < len(cues):
+                print('==> %d of %d blocks changed <==\n' % (len(out), len(cues)))
+            print('\n\n'.join(out) + '\n', flush=True)
+        time.sleep(interval)
+
+def print_scores(results, fmt):
+    if fmt == 'json':
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    elif fmt == 'csv':
+        fields = ['comprehension', 'unknown_tokens', 'unknown_words',
+                  'tokens', 'path']
+        writer = csv.DictWriter(sys.stdout, fields, lineterminator='\n')
+        writer.writeheader()
+        for result in results:
+            row = dict(result)
+            row['comprehension'] = '%.1f' % row['comprehension']
+            writer.writerow(row)
+    else:
+        for result in results:
+            print('%3.0f%% %s' % (result['comprehension'], result['path']))
 
 def main():
     parser = argparse.ArgumentParser(description=__doc__,
         formatter_class=argparse.RawDescriptionHelpFormatter)
-    parser.add_argument('file', nargs='+')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+        help='number of mecab processes to run in parallel')
+    parser.add_argument('--mecab-library', action='store_true',
+        help='run mecab in-process instead of as a subprocess')
+    parser.add_argument('--format', choices=['text', 'csv', 'json'],
+        default='text', help='output format when scoring several files')
+    parser.add_argument('--stats', action='store_true',
+        help='report time spent in each stage on exit')
+    parser.add_argument('--sort', choices=['comprehension', 'unknown'],
+        help='order scores from easiest to hardest')
+    parser.add_argument('--watch', action='store_true',
+        help='keep highlighting a file as it and the known words change')
+    parser.add_argument('file', nargs='+',
+        help="text or subtitle files ('-' for standard input)")
     args = parser.parse_args()
-    for path in args.file:
-        db = KnownDatabase()
-        with open(path) as f:
-            subs = f.read().strip().split('\n\n')
-        db.process_subtitles(subs)
+    if args.stats:
+        stats.enable()
+    if args.mecab_library:
+        use_mecab_library()
+    if args.watch and (len(args.file) != 1 or args.file[0] == '-'):
+        parser.error('--watch needs exactly one file')
+    set_mecab_workers(args.jobs)
+    db = KnownDatabase()
+    if len(args.file) == 1:
         pre = subprocess.check_output(['tput', 'setaf', '1']).decode('utf8')
         post = subprocess.check_output(['tput', 'sgr0']).decode('utf8')
-        if len(args.file) == 1:
-            for line in subs:
-                print(db.highlight(line, pre + '%s' + post))
+        path = args.file[0]
+        if args.watch:
+            try:
+                watch(db, path, pre + '%s' + post)
+            except KeyboardInterrupt:
+                pass
         else:
-            red, total = 0, 0
-            for line in subs:
-                r, t = db.highlight(line, '%s', stats=True)
-                red += r
-                total += t
-            print('%3.0f%% %s' % (100 - (100.0 * red / max(total, 1)), path))
+            f = sys.stdin if path == '-' else open(path)
+            with f:
+                cues = iter_cues(file_format(path), f)
+                for markup in highlight_stream(db, cues, pre + '%s' + post):
+                    print(markup, flush=True)
+    else:
+        results = score_corpus(db, args.file)
+        if args.sort == 'comprehension':
+            results.sort(key=lambda result: -result['comprehension'])
+        elif args.sort == 'unknown':
+            results.sort(key=lambda result: result['unknown_words'])
+        print_scores(results, args.format)
 
 if __name__ == '__main__':
     main()
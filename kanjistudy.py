@@ -16,6 +16,7 @@ from aqt import mw
 from aqt.qt import *
 from aqt.utils import getFile, restoreGeom, saveGeom
 from aqt.webview import AnkiWebView
+from .cards import update_state
 from .highlight import *
 import sqlite3
 
@@ -63,40 +64,23 @@ select kanji_code, study_rating from user_kanji_info where is_radical = 0;
         return ret
 
 def compare(path):
-    ret = ''
-    known = set(''.join(get_known_cards()))
-    known_plus_suspended = set(''.join(get_known_cards(query='')))
+    state, coverage, changes = update_state()
     kanji = ksdata(path)
+    active = sorted(ch for ch, (unsuspended, suspended) in coverage.items()
+                    if unsuspended)
+    ret = []
     for r, name in [(0, 'New'), (1, 'Seen')]:
-        ret += '<h1>%s kanji on a reading flashcard</h1><p>' % name
-        for ch in known:
-            if 'CJK' not in unicodedata.name(ch, 'nope'):
-                continue
-            rating = 0
-            if ch in kanji:
-                rating = kanji[ch]
-            if rating == r:
-                ret += ch
-        ret += '</p>'
-    ret += '<h1>Familiar/Known kanji not on an active reading flashcard</h1><p>'
+        ret.append('<h1>%s kanji on a reading flashcard</h1><p>' % name)
+        ret += [ch for ch in active if kanji.get(ch, 0) == r]
+        ret.append('</p>')
+    ret.append('<h1>Familiar/Known kanji not on an active reading flashcard</h1><p>')
     for ch, rating in kanji.items():
-        if rating >= 2 and ch not in known:
-            if ch in known_plus_suspended:
-                ret += '<font color="red">%s</font>' % ch
+        if rating >= 2 and not coverage.get(ch, [0, 0])[0]:
+            if ch in coverage:
+                ret.append('<font color="red">%s</font>' % ch)
             else:
-                ret += ch
-    ret += '</p>'
-    return ret
-
-def get_known_cards(query='-is:suspended'):
-    ret = []
-    ids = mw.col.findCards(query)
-    for cid in sorted(ids):
-        note = mw.col.getCard(cid).note()
-        if 'japanese' not in note.model()['name'].lower():
-            continue
-        expression = note.fields[0]
-        ret.append(expression)
-    return ret
+                ret.append(ch)
+    ret.append('</p>')
+    return ''.join(ret)
 
 createMenu()
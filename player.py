@@ -0,0 +1,81 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+class Player():
+    # One mpv per study window, controlled through its JSON IPC socket, so
+    # playing from another line seeks instead of loading the video again,
+    # and nothing waits for the player to exit.
+    def __init__(self, path, command=['mpv']):
+        self.path = path
+        self.command = command
+        self.dir = tempfile.mkdtemp(prefix='motto-')
+        self.socket_path = os.path.join(self.dir, 'mpv.sock')
+        self.process = None
+    def connect(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            return None
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(1)
+        try:
+            s.connect(self.socket_path)
+        except OSError:
+            s.close()
+            return None
+        return s
+    def send(self, *commands):
+        # Returns whether a player was listening.  Replies and events are
+        # not waited for.
+        s = self.connect()
+        if s is None:
+            return False
+        with s:
+            s.sendall(b''.join(json.dumps({'command': command}).encode('utf8')
+                               + b'\n' for command in commands))
+        return True
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+    def play_from(self, seconds):
+        seek = [['seek', seconds, 'absolute'], ['set_property', 'pause', False]]
+        if self.send(*seek):
+            return
+        # Either no player is open, or it hasn't opened its socket yet.  In
+        # both cases start over from here rather than wait for it.
+        self.stop()
+        cmd = self.command + ['--start=%.3f' % seconds,
+            '--input-ipc-server=%s' % self.socket_path, '--', self.path]
+        env = os.environ.copy()
+        env['LD_LIBRARY_PATH'] = '' # HACK
+        self.process = subprocess.Popen(cmd, env=env)
+    def stop(self):
+        if self.process is None:
+            self.send(['quit'])
+            return
+        if not self.send(['quit']):
+            self.process.terminate()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.dir, ignore_errors=True)
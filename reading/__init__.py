@@ -6,12 +6,14 @@
 # Automatic reading generation with kakasi and mecab.
 #
 
-import sys, os, platform, re, subprocess
+import sys, os, platform, re, subprocess, json, hashlib, sqlite3, time
+import threading, atexit, ctypes
 try:
     from anki.utils import isWin, isMac
 except ImportError:
     isWin = False
     isMac = False
+from . import stats
 
 kakasiArgs = ["-isjis", "-osjis", "-u", "-JH", "-KH"]
 mecabArgs = ['--node-format=%m[%f[7]][%f[6]] ', '--eos-format=\n',
@@ -43,6 +45,7 @@ class MecabController(object):
 
     def __init__(self):
         self.mecab = None
+        self.lock = threading.Lock()
 
     def setup(self):
         self.mecabCmd = mungeForPlatform(
@@ -64,11 +67,20 @@ class MecabController(object):
             except OSError:
                 raise Exception("Please ensure your Linux system has 64 bit binary support.")
 
-    def run_mecab(self, expr):
-        self.ensureOpen()
-        self.mecab.stdin.write(expr.encode('euc-jp') + b'\n')
-        self.mecab.stdin.flush()
-        expr = self.mecab.stdout.readline().rstrip(b'\r\n').decode('euc-jp')
+    def close(self):
+        with self.lock:
+            if not self.mecab:
+                return
+            try:
+                self.mecab.stdin.close()
+                self.mecab.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.mecab.kill()
+            self.mecab.stdout.close()
+            self.mecab = None
+
+    def parse_output(self, expr):
+        expr = expr.rstrip(b'\r\n').decode('euc-jp')
         ret = []
         for node in expr.split(" "):
             if not node:
@@ -77,20 +89,58 @@ class MecabController(object):
             ret.append((kanji, reading, root))
         return ret
 
+    def run_mecab(self, expr):
+        t = stats.start()
+        data = expr.encode('euc-jp') + b'\n'
+        with self.lock:
+            self.ensureOpen()
+            self.mecab.stdin.write(data)
+            self.mecab.stdin.flush()
+            expr = self.mecab.stdout.readline()
+        stats.stop('mecab', t, len(data) + len(expr))
+        return self.parse_output(expr)
+
+    def run_mecab_batch(self, exprs):
+        # Feed all the lines from a separate thread while reading the
+        # results here, so neither side can fill its pipe and deadlock.
+        if not exprs:
+            return []
+        t = stats.start()
+        data = b''.join(expr.encode('euc-jp') + b'\n' for expr in exprs)
+        errors = []
+        with self.lock:
+            self.ensureOpen()
+            def writer():
+                try:
+                    self.mecab.stdin.write(data)
+                    self.mecab.stdin.flush()
+                except (OSError, ValueError) as e:
+                    errors.append(e)
+            thread = threading.Thread(target=writer)
+            thread.daemon = True
+            thread.start()
+            out = [self.mecab.stdout.readline() for expr in exprs]
+            thread.join()
+        if errors:
+            raise errors[0]
+        if out and not out[-1]:
+            raise Exception("mecab exited unexpectedly")
+        stats.stop('mecab', t, len(data) + sum(len(expr) for expr in out))
+        return [self.parse_output(expr) for expr in out]
+
     def reading(self, expr):
+        return self.format_reading(self.run_mecab(expr))
+
+    def format_reading(self, nodes):
         out = []
-        for kanji, reading, root in self.run_mecab(expr):
+        for kanji, reading, root in nodes:
             # hiragana, punctuation, not japanese, or lacking a reading
             if kanji == reading or not reading:
                 out.append(kanji)
                 continue
-            # katakana
-            if kanji == kakasi.reading(reading):
-                out.append(kanji)
-                continue
             # convert to hiragana
-            reading = kakasi.reading(reading)
-            # ended up the same
+            reading = hiragana(reading)
+            # katakana, or ended up the same
             if reading == kanji:
                 out.append(kanji)
                 continue
@@ -131,6 +181,123 @@ class MecabController(object):
             fin += s
         return fin.strip().replace("< br>", "<br>")
 
+class MecabLibrary(MecabController):
+    """Runs mecab in-process through the bundled shared library."""
+
+    def __init__(self):
+        MecabController.__init__(self)
+        self.lib = None
+        self.tagger = None
+
+    def setup(self):
+        if isWin:
+            name = "libmecab.dll"
+        elif isMac:
+            name = "libmecab.1.dylib"
+        else:
+            name = "libmecab.so.1"
+        self.libPath = os.path.join(supportDir, name)
+        self.mecabArgv = ["mecab"] + mecabArgs + [
+            '-d', supportDir, '-r', os.path.join(supportDir, "mecabrc")]
+
+    def ensureOpen(self):
+        if self.tagger:
+            return
+        self.setup()
+        lib = ctypes.CDLL(self.libPath)
+        lib.mecab_new.restype = ctypes.c_void_p
+        lib.mecab_new.argtypes = [ctypes.c_int, ctypes.POINTER(ctypes.c_char_p)]
+        lib.mecab_strerror.restype = ctypes.c_char_p
+        lib.mecab_strerror.argtypes = [ctypes.c_void_p]
+        lib.mecab_sparse_tostr2.restype = ctypes.c_char_p
+        lib.mecab_sparse_tostr2.argtypes = [
+            ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t]
+        lib.mecab_destroy.restype = None
+        lib.mecab_destroy.argtypes = [ctypes.c_void_p]
+        argv = (ctypes.c_char_p * len(self.mecabArgv))(
+            *[arg.encode('utf8') for arg in self.mecabArgv])
+        tagger = lib.mecab_new(len(self.mecabArgv), argv)
+        if not tagger:
+            raise Exception("Unable to start mecab: %s" % (
+                lib.mecab_strerror(None) or b'').decode('utf8', 'replace'))
+        self.lib = lib
+        self.tagger = tagger
+
+    def close(self):
+        with self.lock:
+            if self.tagger:
+                self.lib.mecab_destroy(self.tagger)
+                self.tagger = None
+
+    def run_mecab(self, expr):
+        t = stats.start()
+        data = expr.encode('euc-jp')
+        with self.lock:
+            self.ensureOpen()
+            out = self.lib.mecab_sparse_tostr2(self.tagger, data, len(data))
+            if out is None:
+                raise Exception(self.lib.mecab_strerror(self.tagger).decode(
+                    'utf8', 'replace'))
+        stats.stop('mecab', t, len(data) + len(out))
+        return self.parse_output(out)
+
+    def run_mecab_batch(self, exprs):
+        return [self.run_mecab(expr) for expr in exprs]
+
+class MecabPool(object):
+    """Shards batches across several mecab processes.
+
+    Workers are started on first use; with a single worker the shared
+    `mecab` controller is used instead.
+    """
+
+    def __init__(self, size=1):
+        self.size = size
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def resize(self, size):
+        size = max(1, size)
+        if size != self.size:
+            self.shutdown()
+            self.size = size
+
+    def ensureOpen(self):
+        with self.lock:
+            if not self.workers:
+                self.workers = [type(mecab)() for i in range(self.size)]
+            return self.workers
+
+    def run_mecab_batch(self, exprs):
+        if self.size <= 1 or len(exprs) < 2 * self.size:
+            return mecab.run_mecab_batch(exprs)
+        workers = self.ensureOpen()
+        step = -(-len(exprs) // len(workers))
+        shards = [exprs[i:i+step] for i in range(0, len(exprs), step)]
+        results = [None] * len(shards)
+        errors = []
+        def work(i):
+            try:
+                results[i] = workers[i].run_mecab_batch(shards[i])
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=work, args=(i,))
+                   for i in range(len(shards))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return [chunk for result in results for chunk in result]
+
+    def shutdown(self):
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.close()
+
 # Kakasi
 ##########################################################################
 
@@ -159,84 +326,261 @@ class KakasiController(object):
                 raise Exception("Please install kakasi")
 
     def reading(self, expr):
+        t = stats.start()
+        data = expr.encode("sjis", "ignore") + b'\n'
         self.ensureOpen()
-        self.kakasi.stdin.write(expr.encode("sjis", "ignore") + b'\n')
+        self.kakasi.stdin.write(data)
         self.kakasi.stdin.flush()
-        res = self.kakasi.stdout.readline().rstrip(b'\r\n').decode("sjis")
-        return res
+        res = self.kakasi.stdout.readline()
+        stats.stop('kakasi', t, len(data) + len(res))
+        return res.rstrip(b'\r\n').decode("sjis")
+
+# Kana
+##########################################################################
+
+# Mecab's readings are in katakana, which we can usually convert directly
+# instead of asking kakasi.  This covers exactly the characters that
+# kakasi passes through or maps one-to-one.
+_nativeKanaRe = re.compile('[\u3041-\u3093\u309d\u309e\u30a1-\u30f3\u30fb-\u30fe]*\\Z')
+_katakanaToHiragana = dict((n, n - 0x60) for n in range(0x30a1, 0x30f4))
+_katakanaToHiragana[0x30fd] = 0x309d
+_katakanaToHiragana[0x30fe] = 0x309e
+
+def katakana_to_hiragana(expr):
+    if not _nativeKanaRe.match(expr):
+        return None
+    return expr.translate(_katakanaToHiragana)
+
+def hiragana(expr):
+    ret = katakana_to_hiragana(expr)
+    if ret is None:
+        ret = kakasi.reading(expr)
+    return ret
 
 # Init
 ##########################################################################
 
 kakasi = KakasiController()
 mecab = MecabController()
+pool = MecabPool()
+
+def set_mecab_workers(n):
+    pool.resize(n)
+
+def use_mecab_library():
+    """Switch to the in-process mecab, if the library loads."""
+    global mecab
+    if isinstance(mecab, MecabLibrary):
+        return True
+    lib = MecabLibrary()
+    try:
+        lib.ensureOpen()
+    except Exception:
+        return False
+    pool.shutdown()
+    mecab.close()
+    mecab = lib
+    return True
+
+@atexit.register
+def shutdown():
+    pool.shutdown()
+    mecab.close()
+
+# Characters that can't safely go through mecab are masked out with \x01
+# and restored afterwards.  That covers furigana and bracketed sections,
+# ASCII and Latin-1, the ideographic space, and anything EUC-JP can't encode.
+
+_maskRe = None
+
+def maskRe():
+    global _maskRe
+    if _maskRe is None:
+        safe = bytearray(0x10000)
+        for n in range(0x100, 0x10000):
+            ch = chr(n)
+            if n != 0x3000 and ch.encode('euc_jp', 'ignore').decode('euc_jp') == ch:
+                safe[n] = 1
+        # Nothing outside the BMP is representable in EUC-JP.
+        ranges = []
+        start = None
+        for n in range(0x10001):
+            if n < 0x10000 and not safe[n]:
+                if start is None:
+                    start = n
+            elif start is not None:
+                ranges.append('%s-%s' % (re.escape(chr(start)), re.escape(chr(n - 1))))
+                start = None
+        ranges.append('%s-%s' % (re.escape(chr(0x10000)), re.escape(chr(sys.maxunicode))))
+        r = r' ?([^ >]+?)\[(.+?)\]'
+        r = '(%s)|(【[^】]*】)' % r
+        r = '(%s)|(《[^》]*》)' % r
+        _maskRe = re.compile('(%s)|[%s]' % (r, ''.join(ranges)))
+    return _maskRe
 
 def fixup(line):
-    ret, extra = '', ''
-    r = r' ?([^ >]+?)\[(.+?)\]'
-    r = '(%s)|(【[^】]*】)' % r
-    r = '(%s)|(《[^》]*》)' % r
-    locked = set()
-    for m in re.finditer(r, line):
-        for i in range(m.start(), m.end()):
-            locked.add(i)
-    for i, ch in enumerate(line):
-        n = ord(ch)
-        replace = False
-        if i in locked:
-            replace = True
-        elif ord(ch) <= 0xff or ord(ch) == 0x3000:
-            replace = True
-        elif ch.encode('euc_jp', 'ignore').decode('euc_jp') != ch:
-            replace = True
-        if replace:
-            ret += '\x01'
-            extra += ch
-        else:
-            ret += ch
-    return ret, extra
+    ret, extra = [], []
+    last = 0
+    for m in maskRe().finditer(line):
+        ret.append(line[last:m.start()])
+        ret.append('\x01' * (m.end() - m.start()))
+        extra.append(m.group())
+        last = m.end()
+    ret.append(line[last:])
+    return ''.join(ret), ''.join(extra)
+
+def unmask(text, extra):
+    # Put the characters of extra back in place of the \x01s in text, in
+    # order.  Any \x01s beyond the end of extra are left alone.
+    parts = text.split('\x01')
+    ret = [parts[0]]
+    for i, part in enumerate(parts[1:]):
+        ret.append(extra[i] if i < len(extra) else '\x01')
+        ret.append(part)
+    return ''.join(ret)
 
 def add_furigana(text):
     text, extra = fixup(text)
     ret = mecab.reading(text)
-    while '\x01' in ret:
-        ret = ret.replace('\x01', extra[0], 1)
-        extra = extra[1:]
+    assert ret.count('\x01') <= len(extra), repr(ret)
+    return unmask(ret, extra)
+
+def add_furigana_batch(texts):
+    # add_furigana() for many texts, parsed together.
+    masked = [fixup(text) for text in texts]
+    results = pool.run_mecab_batch([text for text, extra in masked])
+    assert len(results) == len(masked), (len(results), len(masked))
+    ret = []
+    for nodes, (text, extra) in zip(results, masked):
+        out = mecab.format_reading(nodes)
+        assert out.count('\x01') <= len(extra), repr(out)
+        ret.append(unmask(out, extra))
     return ret
 
 def mecab2(lines):
     lines = [fixup(line) for line in lines]
-    chunks = [mecab.run_mecab(line) for line, extra in lines]
+    chunks = pool.run_mecab_batch([line for line, extra in lines])
     assert len(chunks) == len(lines), (len(chunks), len(lines))
     ret = []
     for chunk, (original, extra) in zip(chunks, lines):
         cur = []
-        check = ''
+        check = []
+        pos = 0
         for seg, reading, base in chunk:
-            check += seg
-            while '\x01' in seg:
-                seg = seg.replace('\x01', extra[0], 1)
-                base = base.replace('\x01', extra[0], 1)
-                reading = reading.replace('\x01', extra[0], 1)
-                extra = extra[1:]
+            check.append(seg)
+            n = seg.count('\x01')
+            if n:
+                chars = extra[pos:pos+n]
+                assert len(chars) == n, repr(extra)
+                seg = unmask(seg, chars)
+                base = unmask(base, chars)
+                reading = unmask(reading, chars)
+                pos += n
             cur.append((seg, base, reading))
+        check = ''.join(check)
         if check != original:
             print
             print(repr(check))
             print(repr(original))
             assert False
         ret.append(cur)
-        assert extra == '', repr(extra)
+        assert pos == len(extra), repr(extra[pos:])
     return ret
 
-def mecab_dict(lines):
+def mecab_dict(lines, cache=None):
     lines = [line for line in lines if line != '']
-    results = mecab2(lines)
-    assert len(lines) == len(results), (len(lines), len(results))
+    # Parse each distinct line once, and only if it isn't cached.
     ret = {}
-    for k, v in zip(lines, results):
-        if k in ret:
-            assert ret[k] == v
+    if cache is not None:
+        ret.update(cache.get_many(lines))
+    missing = list(dict.fromkeys(line for line in lines if line not in ret))
+    results = mecab2(missing)
+    assert len(missing) == len(results), (len(missing), len(results))
+    for k, v in zip(missing, results):
         ret[k] = v
+    if cache is not None:
+        cache.put_many(zip(missing, results))
     ret[''] = []
     return ret
+
+# Parse cache
+##########################################################################
+
+def dictionary_id():
+    h = hashlib.sha1(repr(mecabArgs).encode('utf8'))
+    for name in ['char.bin', 'dicrc', 'matrix.bin', 'sys.dic', 'unk.dic']:
+        path = os.path.join(supportDir, name)
+        if os.path.exists(path):
+            st = os.stat(path)
+            h.update(('%s %d %d\n' % (name, st.st_size, st.st_mtime)).encode('utf8'))
+    return h.hexdigest()
+
+class ParseCache(object):
+    """Persistent cache of mecab2() results, keyed by line.
+
+    The cache is discarded whenever the dictionary changes, and the least
+    recently used lines are evicted once it grows past max_entries.  It may
+    be shared between threads; one connection is used, under a lock.
+    """
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.conn = None
+        self.lock = threading.RLock()
+
+    def ensureOpen(self):
+        if self.conn:
+            return
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        c = self.conn
+        c.execute('create table if not exists meta (key text primary key, value text)')
+        c.execute('create table if not exists lines (line text primary key, tokens text, used real)')
+        c.execute('create index if not exists lines_used on lines (used)')
+        row = c.execute("select value from meta where key = 'dictionary'").fetchone()
+        ident = dictionary_id()
+        if row is None or row[0] != ident:
+            c.execute('delete from lines')
+            c.execute("insert or replace into meta values ('dictionary', ?)", (ident,))
+        c.commit()
+
+    def get_many(self, lines):
+        t = stats.start()
+        ret = {}
+        now = time.time()
+        keys = list(set(lines))
+        with self.lock:
+            self.ensureOpen()
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i+500]
+                q = 'select line, tokens from lines where line in (%s)' % (
+                    ','.join('?' * len(batch)))
+                for line, tokens in self.conn.execute(q, batch):
+                    ret[line] = [tuple(t) for t in json.loads(tokens)]
+            self.conn.executemany('update lines set used = ? where line = ?',
+                                  [(now, line) for line in ret])
+            self.conn.commit()
+        stats.stop('parse_cache', t)
+        return ret
+
+    def put_many(self, items):
+        t = stats.start()
+        now = time.time()
+        rows = [(line, json.dumps(tokens), now) for line, tokens in items]
+        with self.lock:
+            self.ensureOpen()
+            self.conn.executemany('insert or replace into lines values (?, ?, ?)',
+                                  rows)
+            (count,) = self.conn.execute('select count(*) from lines').fetchone()
+            if count > self.max_entries:
+                self.conn.execute('delete from lines where line in '
+                    '(select line from lines order by used limit ?)',
+                    (count - self.max_entries,))
+            self.conn.commit()
+        stats.stop('parse_cache', t)
+
+    def close(self):
+        with self.lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Simon Parent
+# License: GNU GPL, version 3 or later; http://www.gnu.org/copyleft/gpl.html
+#
+# Call counts and timings for the slow stages: mecab, kakasi, rebuilding
+# the known-word index and rewriting files.  Set MOTTO_STATS=1 in the
+# environment (or call enable()) to collect them; a report is printed to
+# stderr at exit.  While disabled, start() returns None and stop() returns
+# straight away.
+#
+
+import atexit, os, sys, time
+from collections import Counter
+
+enabled = False
+calls = Counter()
+seconds = Counter()
+bytesPiped = Counter()
+
+def enable():
+    global enabled
+    if not enabled:
+        enabled = True
+        atexit.register(report)
+
+def start():
+    if enabled:
+        return time.perf_counter()
+    return None
+
+def stop(stage, t, nbytes=0):
+    if t is None:
+        return
+    calls[stage] += 1
+    seconds[stage] += time.perf_counter() - t
+    bytesPiped[stage] += nbytes
+
+def reset():
+    calls.clear()
+    seconds.clear()
+    bytesPiped.clear()
+
+def report(f=None):
+    f = f or sys.stderr
+    f.write('%-20s %10s %12s %12s\n' % ('stage', 'calls', 'seconds', 'bytes'))
+    for stage in sorted(calls, key=lambda stage: -seconds[stage]):
+        f.write('%-20s %10d %12.3f %12d\n' % (
+            stage, calls[stage], seconds[stage], bytesPiped[stage]))
+
+if os.environ.get('MOTTO_STATS'):
+    enable()
@@ -14,9 +14,13 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from aqt import mw
 from aqt.qt import *
-from aqt.utils import getFile
+from aqt.utils import getFile, showWarning
 from aqt.webview import AnkiWebView
+from .cards import apply_config, apply_known_cards, update_state
 from .highlight import *
+from .player import Player
+from .subtitles import file_format, parse_cues
+import traceback
 
 def createMenu():
     a = QAction(mw, text='Study Text or Subtitle File...')
@@ -25,7 +29,7 @@ def createMenu():
 
 def onStudy():
     path = getFile(mw, 'Study Text or Subtitle File',
-        cb=None, key='study', filter='*.srt *.txt')
+        cb=None, key='study', filter='*.srt *.ass *.ssa *.txt')
     if path is None:
         return
     with open(path) as f:
@@ -33,123 +37,301 @@ def onStudy():
     d = MainWindow(mw, path, text)
     d.exec_()
 
-def get_known_cards():
-    ret = []
-    ids = mw.col.findCards("-is:suspended")
-    for cid in ids:
-        note = mw.col.getCard(cid).note()
-        if 'japanese' not in note.model()['name'].lower():
-            continue
-        expression = note.fields[0]
-        ret.append(expression)
-    return ret
+def chunk_html(markup):
+    markup = markup.replace('\n', '<br>')
+    return '<font size="24">%s</font>' % markup
+
+class ChunkModel(QAbstractListModel):
+    # Highlighted markup is only built for rows that get painted, and is
+    # cached until one of the base forms in that row changes status.
+    MarkupRole = Qt.UserRole + 1
+    def __init__(self, main_window):
+        QAbstractListModel.__init__(self)
+        self.main_window = main_window
+        self.cues = []
+        self.markup = {}
+        self.rows = {}
+    def set_cues(self, cues):
+        self.beginResetModel()
+        self.cues = []
+        self.markup = {}
+        self.rows = collections.defaultdict(set)
+        self.endResetModel()
+        self.add_cues(cues)
+    def add_cues(self, cues):
+        if not cues:
+            return
+        first = len(self.cues)
+        self.beginInsertRows(QModelIndex(), first, first + len(cues) - 1)
+        self.cues = self.cues + cues
+        # For each base form, the rows it appears in.
+        jd = self.main_window.db.jd
+        for row, cue in enumerate(cues, first):
+            if cue.text in jd:
+                for base in jd.bases(cue.text):
+                    self.rows[base].add(row)
+        self.endInsertRows()
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.cues)
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        cue = self.cues[row]
+        if role == Qt.DisplayRole:
+            return cue.block
+        if role == self.MarkupRole:
+            if row not in self.markup:
+                markup = cue.block
+                if cue.text in self.main_window.db.jd:
+                    markup = cue.header + self.main_window.db.highlight(
+                        cue.text, '<font color="red">%s</font>')
+                self.markup[row] = chunk_html(markup)
+            return self.markup[row]
+        return None
+    def refresh_bases(self, bases):
+        rows = set()
+        for base in bases:
+            rows |= self.rows.get(base, set())
+        for row in sorted(rows):
+            self.markup.pop(row, None)
+            self.dataChanged.emit(self.index(row), self.index(row))
+
+class ChunkDelegate(QStyledItemDelegate):
+    # Sizes are measured from the plain text, which lays out the same as the
+    # highlighted markup, so rows off screen never need to be highlighted.
+    margin = 6
+    def __init__(self, view):
+        QStyledItemDelegate.__init__(self, view)
+        self.view = view
+        self.sizes = {}
+        self.sizes_width = None
+    def document(self, html, width):
+        doc = QTextDocument()
+        doc.setDefaultFont(self.view.font())
+        doc.setHtml(html)
+        doc.setTextWidth(width)
+        return doc
+    def width(self):
+        return max(self.view.viewport().width() - 2 * self.margin, 1)
+    def sizeHint(self, option, index):
+        width = self.width()
+        if width != self.sizes_width:
+            self.sizes = {}
+            self.sizes_width = width
+        line = index.data(Qt.DisplayRole)
+        if line not in self.sizes:
+            doc = self.document(chunk_html(line), width)
+            self.sizes[line] = QSize(
+                width, int(doc.size().height()) + 2 * self.margin + 1)
+        return self.sizes[line]
+    def paint(self, painter, option, index):
+        painter.save()
+        style = self.view.style()
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter,
+                            self.view)
+        doc = self.document(index.data(ChunkModel.MarkupRole), self.width())
+        painter.translate(option.rect.left() + self.margin,
+                          option.rect.top() + self.margin)
+        doc.drawContents(painter)
+        painter.restore()
+        if index.row() > 0:
+            painter.save()
+            painter.setPen(option.palette.color(QPalette.Mid))
+            painter.drawLine(option.rect.topLeft(), option.rect.topRight())
+            painter.restore()
+
+class ChunkParser(QThread):
+    # Builds the known word database and parses the chunks off the main
+    # thread.  Results only reach the dialog through queued signals, a
+    # growing batch at a time, so the first chunks show up quickly.
+    ready = pyqtSignal()
+    parsed = pyqtSignal(int, int)
+    failed = pyqtSignal(str)
+    def __init__(self, parent, db, state, chunks):
+        QThread.__init__(self, parent)
+        self.db = db
+        self.state = state
+        self.chunks = chunks
+        self.cancelled = False
+    def cancel(self):
+        self.cancelled = True
+    def run(self):
+        try:
+            self.parse()
+        except Cancelled:
+            pass
+        except Exception:
+            self.failed.emit(traceback.format_exc())
+    def parse(self):
+        if self.db is None:
+            cancelled = lambda: self.cancelled
+            db = KnownDatabase(cancelled)
+            apply_known_cards(db, self.state, cancelled)
+            self.db = db
+        self.ready.emit()
+        self.db.subs = []
+        done = 0
+        batch_size = 16
+        while done < len(self.chunks) and not self.cancelled:
+            batch = self.chunks[done:done+batch_size]
+            self.db.add_subtitles(batch)
+            self.parsed.emit(done, done + len(batch))
+            done += len(batch)
+            batch_size = min(2 * batch_size, 1024)
 
 class MainWindow(QDialog):
     def __init__(self, parent, path, text):
         QDialog.__init__(self, parent)
         self.path = path
         self.text = text
-        # Scrollable text area.
-        area = QScrollArea()
-        inner_widget = QWidget()
-        self.inner_layout = QVBoxLayout()
-        area.setWidget(inner_widget)
-        area.setWidgetResizable(True)
-        inner_widget.setLayout(self.inner_layout)
+        # Scrollable list of chunks; only the visible ones are laid out.
+        self.model = ChunkModel(self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(ChunkDelegate(self.view))
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.view.setResizeMode(QListView.Adjust)
+        self.view.setLayoutMode(QListView.Batched)
+        self.view.setBatchSize(50)
+        self.view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.show_context_menu)
         # Controls along the bottom.
         bottom = QWidget()
         bottom.setLayout(QHBoxLayout())
         self.splitmode = QCheckBox('Split on Blank Lines', checked=True)
         self.splitmode.stateChanged.connect(self.create_chunks)
+        self.format = file_format(path)
+        self.splitmode.setEnabled(self.format == 'text')
+        self.progress = QProgressBar()
+        self.progress.setRange(0, 0)
         close = QDialogButtonBox(QDialogButtonBox.Close)
         close.rejected.connect(self.reject)
         bottom.layout().addWidget(self.splitmode)
+        bottom.layout().addWidget(self.progress)
         bottom.layout().addWidget(close)
         # Main layout.
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
-        layout.addWidget(area)
+        layout.addWidget(self.view)
         layout.addWidget(bottom)
         self.setLayout(layout)
         self.resize(1000, 800) # TODO remember size
-        # Process the text.
-        self.db = KnownDatabase()
-        self.db.anki.lines = get_known_cards()
-        self.db.anki.write()
-        self.db.reload()
+        # Process the text in the background.  Only reading the collection
+        # has to happen here, since it isn't safe to use from other threads.
+        apply_config()
+        self.state = update_state()[0]
+        self.db = None
+        self.parser = None
+        self.player = None
+        self.finished.connect(self.stop_parsing)
+        self.finished.connect(self.close_player)
         self.create_chunks()
     def create_chunks(self):
         split = '\n\n' if self.splitmode.isChecked() else '\n'
-        self.subs = self.text.strip().split(split)
-        self.db.process_subtitles(self.subs)
-        # Remove all widgets from self.inner_layout
-        # Adapted from https://stackoverflow.com/questions/4528347
-        while self.inner_layout.count() > 0:
-            child = self.inner_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-        self.chunks = []
-        for i, line in enumerate(self.subs):
-            chunk = TextChunk(self, line)
-            self.chunks.append(chunk)
-            if i > 0:
-                self.inner_layout.addWidget(QFrame(
-                    frameShape=QFrame.HLine, frameShadow=QFrame.Sunken))
-            self.inner_layout.addWidget(chunk)
-    def update_all_lines(self):
-        for chunk in self.chunks:
-            chunk.update_highlighting()
-
-class TextChunk(QLabel):
-    def __init__(self, main_window, line):
-        QLabel.__init__(self, wordWrap=True)
-        self.main_window = main_window
-        self.line = line
-        self.setTextInteractionFlags(Qt.TextSelectableByMouse)
-        self.setContextMenuPolicy(Qt.ActionsContextMenu)
-        self.mark_action = QAction('Toggle Mark', self)
-        self.mark_action.triggered.connect(self.toggle_mark)
-        self.addAction(self.mark_action)
-        self.queue_action = QAction('Toggle Queue', self)
-        self.queue_action.triggered.connect(self.toggle_queue)
-        self.addAction(self.queue_action)
-        play_action = QAction('Play From Here', self)
-        play_action.triggered.connect(self.play_from_here)
-        self.addAction(play_action)
-        self.update_highlighting()
-    def update_highlighting(self):
-        markup = self.main_window.db.highlight(
-            self.line, '<font color="red">%s</font>')
-        markup = markup.replace('\n', '<br>')
-        markup = '<font size="24">%s</font>' % markup
-        self.setText(markup)
-        if self.line not in self.main_window.db.marked.lines:
-            self.mark_action.setText('Mark as Known')
-        else:
-            self.mark_action.setText('Unmark as Known')
-        in_queue = ' (%d in queue)' % self.main_window.db.num_in_queue()
-        if self.line not in self.main_window.db.queue.lines:
-            self.queue_action.setText('Add to Queue' + in_queue)
-        else:
-            self.queue_action.setText('Remove from Queue' + in_queue)
-    def toggle_mark(self):
-        if self.line not in self.main_window.db.marked.lines:
-            self.main_window.db.marked.add(self.line)
-        else:
-            self.main_window.db.marked.remove(self.line)
-        self.main_window.update_all_lines()
-    def toggle_queue(self):
-        if self.line not in self.main_window.db.queue.lines:
-            self.main_window.db.queue.add(self.line)
+        self.cues = parse_cues(self.format, self.text, split)
+        self.cancel_parsing()
+        self.model.set_cues([])
+        self.view.setContextMenuPolicy(Qt.NoContextMenu)
+        self.progress.setRange(0, 0)
+        self.progress.show()
+        parser = ChunkParser(self, self.db, self.state,
+                             [cue.text for cue in self.cues])
+        parser.ready.connect(lambda: self.parser_ready(parser))
+        parser.parsed.connect(
+            lambda start, end: self.chunks_parsed(parser, start, end))
+        parser.failed.connect(
+            lambda message: self.parser_failed(parser, message))
+        self.parser = parser
+        parser.start()
+    def cancel_parsing(self):
+        if self.parser is not None:
+            self.parser.cancel()
+            self.parser.wait()
+            self.db = self.parser.db
+            self.parser = None
+    def stop_parsing(self):
+        self.cancel_parsing()
+        if self.db is not None:
+            self.db.close()
+    def parser_ready(self, parser):
+        if parser is not self.parser:
+            return
+        self.db = parser.db
+        self.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.progress.setRange(0, len(self.cues))
+        self.progress.setValue(0)
+        if not self.cues:
+            # Nothing will be parsed, so chunks_parsed won't hide it.
+            self.progress.hide()
+    def parser_failed(self, parser, message):
+        if parser is not self.parser:
+            return
+        self.progress.hide()
+        showWarning('Could not parse the text.\n\n' + message, parent=self)
+    def chunks_parsed(self, parser, start, end):
+        if parser is not self.parser:
+            return
+        self.model.add_cues(self.cues[start:end])
+        self.progress.setValue(end)
+        if end == len(self.cues):
+            self.progress.hide()
+    def update_changed_lines(self):
+        self.model.refresh_bases(self.db.pop_changed())
+    def stored_as(self, collection, cue):
+        # Lines are marked and queued by their text.  They used to be
+        # whole blocks, timing and all, so those still count.
+        for line in [cue.text, cue.block]:
+            if line in collection:
+                return line
+        return None
+    def show_context_menu(self, pos):
+        index = self.view.indexAt(pos)
+        if not index.isValid():
+            return
+        cue = self.model.cues[index.row()]
+        menu = QMenu(self)
+        if cue.text.strip():
+            if self.stored_as(self.db.marked, cue) is None:
+                a = menu.addAction('Mark as Known')
+            else:
+                a = menu.addAction('Unmark as Known')
+            a.triggered.connect(lambda: self.toggle_mark(cue))
+            in_queue = ' (%d in queue)' % self.db.num_in_queue()
+            if self.stored_as(self.db.queue, cue) is None:
+                a = menu.addAction('Add to Queue' + in_queue)
+            else:
+                a = menu.addAction('Remove from Queue' + in_queue)
+            a.triggered.connect(lambda: self.toggle_queue(cue))
+        if cue.start is not None:
+            a = menu.addAction('Play From Here')
+            a.triggered.connect(lambda: self.play_from_here(cue))
+        menu.addSeparator()
+        a = menu.addAction('Copy')
+        a.triggered.connect(lambda: QApplication.clipboard().setText(cue.text))
+        menu.exec_(self.view.viewport().mapToGlobal(pos))
+    def toggle(self, collection, cue):
+        line = self.stored_as(collection, cue)
+        if line is None:
+            collection.add(cue.text)
         else:
-            self.main_window.db.queue.remove(self.line)
-        self.main_window.update_all_lines()
-    def play_from_here(self):
-        mkv_path = os.path.splitext(self.main_window.path)[0] + '.mkv'
-        start = self.line.split('\n')[1].split(' --> ')[0].replace(',', '.')
-        cmd = ['mpv', '--start=%s' % start, '--', mkv_path]
-        env = os.environ.copy()
-        env['LD_LIBRARY_PATH'] = '' # HACK
-        subprocess.call(cmd, env=env)
+            collection.remove(line)
+        self.update_changed_lines()
+    def toggle_mark(self, cue):
+        self.toggle(self.db.marked, cue)
+    def toggle_queue(self, cue):
+        self.toggle(self.db.queue, cue)
+    def play_from_here(self, cue):
+        if self.player is None:
+            self.player = Player(os.path.splitext(self.path)[0] + '.mkv')
+        self.player.play_from(cue.start)
+    def close_player(self):
+        if self.player is not None:
+            self.player.close()
+            self.player = None
 
 createMenu()
@@ -0,0 +1,105 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import re
+
+# Subtitle files are read as a sequence of cues, each with its start and
+# end times in seconds and the dialogue text, so that only the dialogue
+# gets parsed and scored.  header is whatever came before the text in the
+# file (the index and timing lines of an SRT block); block is the header
+# and text together, as they appeared.  Plain text has a cue per block,
+# with no times.
+
+class Cue():
+    def __init__(self, start, end, text, header=''):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.header = header
+    @property
+    def block(self):
+        return self.header + self.text
+
+_srtTimingRe = re.compile(
+    r'\s*(\d+):(\d+):(\d+)[,.](\d+)\s*-->\s*(\d+):(\d+):(\d+)[,.](\d+)')
+
+def srt_time(h, m, s, ms):
+    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 10.0 ** len(ms)
+
+def srt_cues(blocks):
+    for block in blocks:
+        lines = block.split('\n')
+        i = 1 if len(lines) > 1 and lines[0].strip().isdigit() else 0
+        m = _srtTimingRe.match(lines[i])
+        if m is None:
+            yield Cue(None, None, block)
+            continue
+        g = m.groups()
+        n = sum(len(line) + 1 for line in lines[:i+1])
+        yield Cue(srt_time(*g[:4]), srt_time(*g[4:]), block[n:], block[:n])
+
+_assOverrideRe = re.compile(r'\{[^}]*\}')
+
+def ass_time(t):
+    h, m, s = t.strip().split(':')
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+def ass_text(text):
+    text = _assOverrideRe.sub('', text)
+    text = text.replace('\\N', '\n').replace('\\n', '\n').replace('\\h', ' ')
+    return text.strip()
+
+def ass_cues(lines):
+    # Only Dialogue lines in the [Events] section, with the fields named by
+    # its Format line.  Text is always the last field and may hold commas.
+    fields = ['Layer', 'Start', 'End', 'Style', 'Name',
+              'MarginL', 'MarginR', 'MarginV', 'Effect', 'Text']
+    events = False
+    for line in lines:
+        line = line.strip().lstrip('\ufeff')
+        if line.startswith('['):
+            events = line.lower() == '[events]'
+            continue
+        if not events or ':' not in line:
+            continue
+        kind, value = line.split(':', 1)
+        if kind == 'Format':
+            fields = [field.strip() for field in value.split(',')]
+        elif kind == 'Dialogue':
+            values = dict(zip(fields, value.split(',', len(fields) - 1)))
+            if 'Text' not in values:
+                continue
+            yield Cue(ass_time(values['Start']), ass_time(values['End']),
+                      ass_text(values['Text']))
+
+def text_cues(blocks):
+    for block in blocks:
+        yield Cue(None, None, block)
+
+def file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.ass', '.ssa'):
+        return 'ass'
+    if ext == '.srt':
+        return 'srt'
+    return 'text'
+
+def parse_cues(fmt, text, split_on='\n\n'):
+    if fmt == 'ass':
+        return list(ass_cues(text.split('\n')))
+    blocks = text.strip().split(split_on)
+    if fmt == 'srt':
+        return list(srt_cues(blocks))
+    return list(text_cues(blocks))
@@ -0,0 +1,37 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from charclass import has_japanese_text, is_cjk
+import sys
+import unicodedata
+import unittest
+
+class TestCharClass(unittest.TestCase):
+
+    def test_all_codepoints(self):
+        for n in range(sys.maxunicode + 1):
+            ch = chr(n)
+            name = unicodedata.name(ch, 'nope')
+            japanese = 'KATAKANA' in name or 'HIRAGANA' in name \
+                or 'CJK' in name
+            self.assertEqual(has_japanese_text(ch), japanese, hex(n))
+            self.assertEqual(is_cjk(ch), 'CJK' in name, hex(n))
+
+    def test_strings(self):
+        self.assertFalse(has_japanese_text(''))
+        self.assertFalse(has_japanese_text('Romaji 123'))
+        self.assertTrue(has_japanese_text('abcかdef'))
+        self.assertTrue(has_japanese_text('<br>カタカナ'))
+        self.assertTrue(has_japanese_text('漢字'))
+        self.assertFalse(has_japanese_text('１２３、。'))
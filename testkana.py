@@ -0,0 +1,41 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from reading import kakasi, katakana_to_hiragana, hiragana
+import random
+import unittest
+
+class TestKana(unittest.TestCase):
+
+    def test_examples(self):
+        self.assertEqual(katakana_to_hiragana('カンジ'), 'かんじ')
+        self.assertEqual(katakana_to_hiragana('ラーメン'), 'らーめん')
+        self.assertEqual(katakana_to_hiragana('ひらがな'), 'ひらがな')
+        self.assertEqual(katakana_to_hiragana(''), '')
+        self.assertIsNone(katakana_to_hiragana('ヴァイオリン'))
+        self.assertIsNone(katakana_to_hiragana('漢字'))
+        self.assertEqual(hiragana('ヴァイオリン'), kakasi.reading('ヴァイオリン'))
+
+    def test_matches_kakasi(self):
+        for n in range(0x3000, 0x3100):
+            ch = chr(n)
+            ret = katakana_to_hiragana(ch)
+            if ret is not None:
+                self.assertEqual(ret, kakasi.reading(ch), hex(n))
+        alphabet = [chr(n) for n in range(0x3041, 0x30ff)
+                    if katakana_to_hiragana(chr(n)) is not None]
+        rng = random.Random(0)
+        for i in range(1000):
+            s = ''.join(rng.choice(alphabet) for j in range(rng.randint(1, 8)))
+            self.assertEqual(katakana_to_hiragana(s), kakasi.reading(s), s)
@@ -0,0 +1,76 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import reading
+import shutil
+import tempfile
+import unittest
+
+class Clock():
+    # Stands in for the time module, so which lines were used last doesn't
+    # depend on the resolution of the real clock.
+    def __init__(self):
+        self.now = 0
+    def time(self):
+        self.now += 1
+        return self.now
+
+class TestParseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'parse_cache.sqlite')
+        self.old_time = reading.time
+        self.old_dictionary_id = reading.dictionary_id
+        reading.time = Clock()
+        reading.dictionary_id = lambda: 'ipadic 1'
+        self.caches = []
+
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        reading.time = self.old_time
+        reading.dictionary_id = self.old_dictionary_id
+        shutil.rmtree(self.dir)
+
+    def cache(self, **kwargs):
+        cache = reading.ParseCache(self.path, **kwargs)
+        self.caches.append(cache)
+        return cache
+
+    def test_round_trip(self):
+        tokens = [('猫', '猫', 'ネコ'), ('だ', 'だ', 'ダ')]
+        self.cache().put_many([('猫だ', tokens), ('OK', [('OK', 'OK', '')])])
+        # Tokens come back as tuples, even from another connection.
+        self.assertEqual(self.cache().get_many(['猫だ', 'OK', '犬']), {
+            '猫だ': tokens,
+            'OK': [('OK', 'OK', '')],
+        })
+
+    def test_eviction(self):
+        cache = self.cache(max_entries=3)
+        for line in ['a', 'b', 'c']:
+            cache.put_many([(line, [(line, line, '')])])
+        # Using a makes b the least recently used.
+        cache.get_many(['a'])
+        cache.put_many([('d', [('d', 'd', '')])])
+        self.assertEqual(sorted(cache.get_many(['a', 'b', 'c', 'd'])),
+                         ['a', 'c', 'd'])
+
+    def test_dictionary_changed(self):
+        self.cache().put_many([('猫', [('猫', '猫', 'ネコ')])])
+        self.assertEqual(len(self.cache().get_many(['猫'])), 1)
+        reading.dictionary_id = lambda: 'ipadic 2'
+        self.assertEqual(self.cache().get_many(['猫']), {})
@@ -0,0 +1,124 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from player import Player
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+class FakeMpv():
+    # Listens on a player's socket and records the commands sent to it.
+    def __init__(self, path):
+        self.commands = []
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(5)
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+    def serve(self):
+        while True:
+            try:
+                conn, addr = self.server.accept()
+            except OSError:
+                return
+            with conn:
+                data = b''
+                while True:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        break
+                    data += chunk
+            for line in data.decode('utf8').splitlines():
+                self.commands.append(json.loads(line)['command'])
+    def wait_for(self, n):
+        for i in range(100):
+            if len(self.commands) >= n:
+                break
+            time.sleep(0.01)
+        return self.commands
+    def close(self):
+        self.server.close()
+
+# Stands in for mpv when the player has to start one: records its
+# arguments and exits.
+FAKE_MPV = '''
+import json, sys
+with open(sys.argv[1], 'w') as f:
+    json.dump(sys.argv[2:], f)
+'''
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'needs unix sockets')
+class TestPlayer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.args_path = os.path.join(self.dir, 'args.json')
+        self.player = Player('/videos/episode.mkv', command=[
+            sys.executable, '-c', FAKE_MPV, self.args_path])
+
+    def tearDown(self):
+        self.player.close()
+        shutil.rmtree(self.dir)
+
+    def started_with(self):
+        self.player.process.wait()
+        with open(self.args_path) as f:
+            return json.load(f)
+
+    def test_start(self):
+        self.player.play_from(62.5)
+        self.assertEqual(self.started_with(), ['--start=62.500',
+            '--input-ipc-server=%s' % self.player.socket_path,
+            '--', '/videos/episode.mkv'])
+
+    def test_seek(self):
+        mpv = FakeMpv(self.player.socket_path)
+        try:
+            self.player.play_from(10)
+            self.player.play_from(20.25)
+            self.assertIsNone(self.player.process)
+            self.assertEqual(mpv.wait_for(4), [
+                ['seek', 10, 'absolute'], ['set_property', 'pause', False],
+                ['seek', 20.25, 'absolute'], ['set_property', 'pause', False],
+            ])
+            self.player.stop()
+            self.assertEqual(mpv.wait_for(5)[-1], ['quit'])
+        finally:
+            mpv.close()
+
+    def test_restart(self):
+        # The player was closed, so a new one is started.
+        mpv = FakeMpv(self.player.socket_path)
+        mpv.close()
+        self.player.play_from(5)
+        self.assertEqual(self.started_with()[0], '--start=5.000')
+
+    def test_restart_while_starting(self):
+        # A player that hasn't opened its socket yet is replaced, not
+        # waited for, and the old process is reaped.
+        self.player.command = [sys.executable, '-c',
+            'import time; time.sleep(30)']
+        self.player.play_from(5)
+        first = self.player.process
+        self.player.command = [sys.executable, '-c', FAKE_MPV, self.args_path]
+        self.player.play_from(7)
+        self.assertIsNotNone(first.returncode)
+        self.assertEqual(self.started_with()[0], '--start=7.000')
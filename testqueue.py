@@ -0,0 +1,94 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import highlight
+import os
+import shutil
+import tempfile
+import unittest
+
+def ignore(line, delta):
+    pass
+
+class TestReviewQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.old_dir = highlight.user_files_dir
+        highlight.user_files_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(highlight.user_files_dir)
+        highlight.user_files_dir = self.old_dir
+
+    def write_queue(self, lines):
+        with open(highlight.user_file('queue.txt'), 'w') as f:
+            f.write('\n\n'.join(lines) + '\n')
+
+    def test_take(self):
+        self.write_queue(['a', 'b', 'c'])
+        queue = highlight.ReviewQueue(ignore)
+        self.assertEqual(queue.remaining(), 3)
+        self.assertEqual(queue.take(), 'a')
+        self.assertEqual(queue.take(), 'b')
+        self.assertEqual(queue.remaining(), 1)
+        self.assertEqual(highlight.ReviewQueue(ignore).remaining(), 1)
+
+    def test_migrate_marker(self):
+        self.write_queue(['a', 'b', '***', 'c', 'd'])
+        queue = highlight.ReviewQueue(ignore)
+        self.assertEqual(queue.lines, ['a', 'b', 'c', 'd'])
+        self.assertEqual(queue.remaining(), 2)
+        self.assertEqual(queue.take(), 'c')
+        queue = highlight.ReviewQueue(ignore)
+        self.assertEqual(queue.lines, ['a', 'b', 'c', 'd'])
+        self.assertEqual(queue.take(), 'd')
+
+    def test_remove_before_cursor(self):
+        self.write_queue(['a', 'b', 'c', 'd'])
+        queue = highlight.ReviewQueue(ignore)
+        queue.take()
+        queue.take()
+        queue.remove('a')
+        self.assertEqual(queue.remaining(), 2)
+        queue.remove('d')
+        self.assertEqual(queue.remaining(), 1)
+        self.assertEqual(queue.take(), 'c')
+
+    def test_refresh(self):
+        self.write_queue(['a', 'b'])
+        editor = highlight.ReviewQueue(ignore)
+        study = highlight.ReviewQueue(ignore)
+        study.add('c')
+        editor.refresh()
+        self.assertEqual(editor.remaining(), 3)
+        self.assertEqual(editor.take(), 'a')
+        study.remove('b')
+        editor.refresh()
+        self.assertEqual(editor.lines, ['a', 'c'])
+        self.assertEqual(editor.take(), 'c')
+        self.assertEqual(editor.remaining(), 0)
+
+    def test_close_keeps_other_changes(self):
+        self.write_queue(['a'])
+        study = highlight.ReviewQueue(ignore)
+        other = highlight.ReviewQueue(ignore)
+        study.add('b')
+        other.add('c')
+        study.add('d')
+        study.close()
+        self.assertEqual(highlight.ReviewQueue(ignore).lines,
+                         ['a', 'b', 'c', 'd'])
+        other.close()
+        self.assertEqual(highlight.ReviewQueue(ignore).lines,
+                         ['a', 'b', 'c', 'd'])
@@ -0,0 +1,75 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from subtitles import ass_cues, file_format, parse_cues, srt_cues
+import unittest
+
+SRT = '''1
+00:00:01,500 --> 00:00:03,000
+こんにちは
+
+2
+01:02:03,045 --> 01:02:04,000
+<i>一行目</i>
+二行目
+'''
+
+ASS = '''\ufeff[Script Info]
+Title: テスト
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize
+Style: Default,Arial,20
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Comment: 0,0:00:00.00,0:00:01.00,Default,,0,0,0,,コメント
+Dialogue: 0,0:00:01.50,0:00:03.00,Default,太郎,0,0,0,,{\\i1}こんにちは{\\i0}
+Dialogue: 0,1:02:03.04,1:02:04.00,Default,,0,0,0,,一行目、\\N二行目
+'''
+
+class TestSubtitles(unittest.TestCase):
+
+    def test_srt(self):
+        cues = parse_cues('srt', SRT)
+        self.assertEqual(len(cues), 2)
+        self.assertEqual(cues[0].start, 1.5)
+        self.assertEqual(cues[0].end, 3.0)
+        self.assertEqual(cues[0].text, 'こんにちは')
+        self.assertAlmostEqual(cues[1].start, 3723.045)
+        self.assertEqual(cues[1].text, '<i>一行目</i>\n二行目')
+        # The blocks are the same as before subtitles were parsed.
+        self.assertEqual([cue.block for cue in cues],
+                         SRT.strip().split('\n\n'))
+
+    def test_srt_without_timing(self):
+        cues = list(srt_cues(['ただの文章', '']))
+        self.assertEqual([cue.start for cue in cues], [None, None])
+        self.assertEqual([cue.text for cue in cues], ['ただの文章', ''])
+
+    def test_ass(self):
+        cues = list(ass_cues(ASS.split('\n')))
+        self.assertEqual(len(cues), 2)
+        self.assertEqual(cues[0].start, 1.5)
+        self.assertEqual(cues[0].text, 'こんにちは')
+        self.assertAlmostEqual(cues[1].start, 3723.04)
+        self.assertEqual(cues[1].end, 3724.0)
+        self.assertEqual(cues[1].text, '一行目、\n二行目')
+
+    def test_text(self):
+        cues = parse_cues('text', '一\n二\n\n三\n', split_on='\n')
+        self.assertEqual([cue.text for cue in cues], ['一', '二', '', '三'])
+        self.assertEqual(file_format('a/b.SRT'), 'srt')
+        self.assertEqual(file_format('b.ssa'), 'ass')
+        self.assertEqual(file_format('b.txt'), 'text')
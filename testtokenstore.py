@@ -0,0 +1,46 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from tokenstore import TokenStore, Vocabulary
+import unittest
+
+class TestTokenStore(unittest.TestCase):
+
+    def test_interning(self):
+        vocab = Vocabulary()
+        jd = TokenStore(vocab)
+        jd.update({
+            '猫が好き': [('猫', '猫', 'ネコ'), ('が', 'が', 'ガ'),
+                         ('好き', '好き', 'スキ')],
+            '猫だ': [('猫', '猫', 'ネコ'), ('だ', 'だ', 'ダ')],
+            'OK': [('OK', 'OK', '')],
+        })
+        self.assertIn('猫だ', jd)
+        self.assertNotIn('犬', jd)
+        self.assertEqual(vocab.strings.count('猫'), 1)
+        self.assertEqual(jd.bases('猫だ'),
+                         set([vocab.intern('猫'), vocab.intern('だ')]))
+        self.assertEqual(jd.japanese_bases('OK'), set())
+        ids = jd.ids('猫が好き')
+        self.assertEqual([vocab.strings[i] for i in ids[0::3]],
+                         ['猫', 'が', '好き'])
+
+    def test_shared_vocabulary(self):
+        vocab = Vocabulary()
+        a = TokenStore(vocab)
+        b = TokenStore(vocab)
+        a.add('犬', [('犬', '犬', 'イヌ')])
+        b.add('犬', [('犬', '犬', 'イヌ')])
+        self.assertEqual(list(a.ids('犬')), list(b.ids('犬')))
+        self.assertEqual(len(vocab.strings), 2)
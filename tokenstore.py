@@ -0,0 +1,65 @@
+# Copyright (c) 2018 Simon Parent
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+if not __package__: # HACK
+    from charclass import has_japanese_text
+else:
+    from .charclass import has_japanese_text
+from array import array
+
+class Vocabulary():
+    # Gives every distinct surface, base form and reading an integer id,
+    # so each string is stored once however many tokens use it.  Whether
+    # the string contains Japanese is worked out once, when it is added.
+    def __init__(self):
+        self.strings = []
+        self.ids = {}
+        self.japanese = bytearray()
+    def intern(self, s):
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+            self.japanese.append(has_japanese_text(s))
+        return i
+
+class TokenStore():
+    # Parsed lines, as returned by mecab_dict, with the tokens of every
+    # line kept as (surface, base, reading) id triples in one flat array.
+    # spans[line] is where the line's triples start and end.
+    def __init__(self, vocab):
+        self.vocab = vocab
+        self.tokens = array('i')
+        self.spans = {}
+    def __contains__(self, line):
+        return line in self.spans
+    def add(self, line, tokens):
+        if line in self.spans:
+            return
+        intern = self.vocab.intern
+        start = len(self.tokens)
+        self.tokens.extend(intern(s) for token in tokens for s in token)
+        self.spans[line] = (start, len(self.tokens))
+    def update(self, parsed):
+        for line, tokens in parsed.items():
+            self.add(line, tokens)
+    def ids(self, line):
+        # The flat (surface, base, reading) ids for line.
+        start, end = self.spans[line]
+        return self.tokens[start:end]
+    def bases(self, line):
+        return set(self.ids(line)[1::3])
+    def japanese_bases(self, line):
+        japanese = self.vocab.japanese
+        return set(b for b in self.ids(line)[1::3] if japanese[b])